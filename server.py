@@ -6,9 +6,18 @@ Intelligent memory management with AI extraction, auto-recall, and silent operat
 
 import os
 import asyncio
+import atexit
+import hashlib
+import heapq
 import json
-from typing import Any, Optional
-from collections import Counter
+import logging
+import re
+import sys
+import time
+from typing import Any, Hashable, Iterator, Optional
+from collections import Counter, OrderedDict, defaultdict, deque
+from dataclasses import asdict, dataclass, is_dataclass
+from functools import lru_cache
 from datetime import datetime, timezone
 
 from mcp.server import Server
@@ -16,9 +25,16 @@ from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 from mem0 import MemoryClient
 
+try:
+    import orjson
+except ImportError:  # Optional speedup, stdlib json is the fallback
+    orjson = None
+
 # ─────────────────────────
 # CONFIG & SETUP
 # ─────────────────────────
+log = logging.getLogger("mem0_cathedral_mcp")
+
 MEM0_API_KEY = os.environ.get("MEM0_API_KEY")
 DEFAULT_USER_ID = "el-jefe-principal"
 VERSION = "12.1.0"
@@ -26,10 +42,35 @@ VERSION = "12.1.0"
 # Graph feature control (requires Mem0 PRO subscription)
 ENABLE_GRAPH_FEATURES = os.getenv("ENABLE_GRAPH_FEATURES", "false").lower() == "true"
 
+# Pretty-print tool responses (debugging only; compact JSON is faster)
+PRETTY_JSON = os.getenv("PRETTY_JSON", "false").lower() == "true"
+
+# Responses with more items than this are encoded in a worker thread
+LARGE_RESPONSE_ITEMS = 500
+
 # Quality thresholds
 MIN_MEMORY_LENGTH = 20  # Minimum characters for a memory
 MIN_WORD_COUNT = 4      # Minimum words in a memory
+QUALITY_SCAN_CHARS = 1024  # Pattern checks only look at this much content
 SIMILARITY_THRESHOLD = 0.85  # Deduplication threshold
+CONSOLIDATION_THRESHOLD = 0.7  # Lower threshold for consolidation
+
+# Search result cache
+SEARCH_CACHE_SIZE = 256  # Cached queries per user
+SEARCH_CACHE_TTL = 600   # Seconds before a cached result goes stale
+CONTEXT_CACHE_TTL = 60   # Shorter for auto-recall, which runs every turn
+CONSOLIDATION_CACHE_TTL = 24 * 3600  # Keyed on memory contents, so never stale
+
+# Opt-in: when set, consolidation results (which include memory contents)
+# are kept in this directory so they survive restarts
+CACHE_DIR = os.path.expanduser(os.getenv("MEM0_CATHEDRAL_CACHE_DIR", ""))
+CONSOLIDATION_CACHE_MAX_BYTES = 10 * 1024 * 1024
+
+# Recently saved legacy-mode memories remembered for exact-duplicate checks
+RECENT_ADDS_SIZE = 32
+
+# Common words ignored when building similarity search queries
+STOPWORDS = frozenset({"the", "a", "an", "is", "are", "was", "were", "in", "on", "at", "to", "for"})
 
 if not MEM0_API_KEY:
     raise RuntimeError("MEM0_API_KEY environment variable is required")
@@ -37,6 +78,20 @@ if not MEM0_API_KEY:
 # Initialize Mem0 client
 mem0_client = MemoryClient(api_key=MEM0_API_KEY)
 
+# Bound concurrent Mem0 requests so bursts queue here instead of
+# exhausting the default thread pool or flooding the API
+MEM0_CONCURRENCY = 16
+mem0_semaphore = asyncio.Semaphore(MEM0_CONCURRENCY)
+
+
+async def call_mem0(fn, *args, **kwargs) -> Any:
+    """
+    Run a blocking Mem0 client method in a worker thread, limited to
+    MEM0_CONCURRENCY calls in flight.
+    """
+    async with mem0_semaphore:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
 # ─────────────────────────
 # DEFAULT CATEGORIES & INSTRUCTIONS (Mem0 Native Features)
 # ─────────────────────────
@@ -68,15 +123,148 @@ Extract memories with these priorities:
 - Prefer specific facts over general statements
 """
 
+# ─────────────────────────
+# JSON ENCODING
+# ─────────────────────────
+
+def _dump(obj: Any) -> str:
+    """
+    Serialize a tool response. Uses orjson when installed and compact
+    separators otherwise; indentation only when PRETTY_JSON is set.
+    Dataclass records are serialized as objects.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if PRETTY_JSON else 0).decode()
+    if PRETTY_JSON:
+        return json.dumps(obj, indent=2, default=_encode_record)
+    return json.dumps(obj, separators=(",", ":"), default=_encode_record)
+
+
+async def _dump_large(obj: Any, item_count: int) -> str:
+    """
+    Like _dump, but encodes big payloads in a worker thread so a large
+    get-all or consolidation response doesn't stall other tool calls.
+    """
+    if item_count > LARGE_RESPONSE_ITEMS:
+        return await asyncio.to_thread(_dump, obj)
+    return _dump(obj)
+
+
+def _encode_record(obj: Any) -> dict:
+    """Fallback encoder hook for the stdlib json module."""
+    if is_dataclass(obj):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# ─────────────────────────
+# RESPONSE RECORDS
+# ─────────────────────────
+
+@dataclass(slots=True, frozen=True)
+class MemoryView:
+    """
+    A memory as returned to MCP clients. Slotted to keep large
+    get-all responses light until they are encoded.
+    """
+    id: Optional[str]
+    content: Optional[str]
+    created_at: Optional[str]
+    updated_at: Optional[str]
+
+    @classmethod
+    def from_mem0(cls, mem: dict) -> "MemoryView":
+        return cls(
+            id=mem.get("id"),
+            content=mem.get("memory"),
+            created_at=mem.get("created_at"),
+            updated_at=mem.get("updated_at"),
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class SearchHit(MemoryView):
+    """A search result: a memory plus its categories and relevance score."""
+    categories: list
+    score: Optional[float]
+
+    @classmethod
+    def from_mem0(cls, mem: dict) -> "SearchHit":
+        return cls(
+            id=mem.get("id"),
+            content=mem.get("memory"),
+            created_at=mem.get("created_at"),
+            updated_at=mem.get("updated_at"),
+            categories=mem.get("categories", []),
+            score=mem.get("score"),
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class ConsolidationCandidate:
+    """A pair of similar memories that could be merged."""
+    memory1_id: Optional[str]
+    memory1_content: str
+    memory2_id: Optional[str]
+    memory2_content: str
+    similarity: float
+
+
+# ─────────────────────────
+# TOKENIZATION
+# ─────────────────────────
+
+# Words, keeping inner apostrophes ("don't") but not surrounding punctuation
+WORD_RE = re.compile(r"\w+(?:'\w+)*")
+
+
+@lru_cache(maxsize=1024)
+def _tokens(text: str) -> tuple[str, ...]:
+    """
+    Lowercased word tokens of a text, cached so repeated passes over the
+    same content (quality check, dedup, similarity) tokenize it only once.
+    Punctuation is dropped, so "prefer," and "prefer" are the same token.
+    """
+    return tuple(WORD_RE.findall(text.lower()))
+
+
 # ─────────────────────────
 # QUALITY FILTERING
 # ─────────────────────────
 
-def assess_memory_quality(content: str) -> dict[str, Any]:
+# Acknowledgments that carry no memorable information (exact match)
+LOW_VALUE_PATTERNS = frozenset({
+    "ok", "okay", "got it", "understood", "sure", "thanks", "thank you",
+    "yes", "no", "maybe", "i see", "alright", "cool", "nice"
+})
+
+# Words that only ever make up acknowledgments ("ok thanks!", "yeah sure")
+LOW_VALUE_WORDS = frozenset(
+    word for pattern in LOW_VALUE_PATTERNS for word in pattern.split()
+) | {"yeah", "yep", "yup", "nope", "thx", "great", "awesome", "perfect", "so", "much", "very"}
+
+# Phrases that suggest durable, contextual information
+GOOD_INDICATORS = (
+    "prefer", "like", "love", "hate", "dislike", "always", "never",
+    "project", "work", "use", "technology", "tool", "language",
+    "name is", "location", "timezone", "schedule", "routine",
+    "goal", "objective", "plan", "want to", "need to"
+)
+
+# All indicators in one pattern: a single scan instead of one per phrase.
+# Anchored at word starts only, so inflections ("preferred", "projects")
+# still count but words like "because" no longer match "use".
+GOOD_INDICATORS_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, GOOD_INDICATORS)) + ")")
+
+def assess_memory_quality(content: str, tokens: Optional[tuple[str, ...]] = None) -> dict[str, Any]:
     """
     Assess the quality of memory content before saving.
     Returns a dict with quality metrics and whether to save.
+    Pass `tokens` if the caller has already tokenized the content.
     """
+    if tokens is None:
+        tokens = _tokens(content)
+
     quality = {
         "should_save": True,
         "issues": [],
@@ -90,33 +278,21 @@ def assess_memory_quality(content: str) -> dict[str, Any]:
         quality["score"] -= 50
 
     # Check word count
-    word_count = len(content.split())
+    word_count = len(tokens)
     if word_count < MIN_WORD_COUNT:
         quality["should_save"] = False
         quality["issues"].append(f"Too few words (min {MIN_WORD_COUNT} words)")
         quality["score"] -= 30
 
-    # Check for low-value patterns
-    low_value_patterns = [
-        "ok", "okay", "got it", "understood", "sure", "thanks", "thank you",
-        "yes", "no", "maybe", "i see", "alright", "cool", "nice"
-    ]
-
-    content_lower = content.lower().strip()
-    if content_lower in low_value_patterns:
+    # Check for low-value patterns (pattern checks only scan a bounded prefix)
+    content_lower = content[:QUALITY_SCAN_CHARS].lower().strip()
+    if content_lower in LOW_VALUE_PATTERNS or (tokens and all(t in LOW_VALUE_WORDS for t in tokens)):
         quality["should_save"] = False
         quality["issues"].append("Low-value acknowledgment")
         quality["score"] -= 40
 
     # Check for contextual information (good indicators)
-    good_indicators = [
-        "prefer", "like", "love", "hate", "dislike", "always", "never",
-        "project", "work", "use", "technology", "tool", "language",
-        "name is", "location", "timezone", "schedule", "routine",
-        "goal", "objective", "plan", "want to", "need to"
-    ]
-
-    has_context = any(indicator in content_lower for indicator in good_indicators)
+    has_context = GOOD_INDICATORS_RE.search(content_lower) is not None
     if has_context:
         quality["score"] += 20
 
@@ -128,18 +304,38 @@ def assess_memory_quality(content: str) -> dict[str, Any]:
     return quality
 
 
+# (epoch second, ISO string) of the last timestamp formatted
+_timestamp_cache: tuple[int, str] = (0, "")
+
+
+def _utc_timestamp() -> str:
+    """
+    Current UTC time as an ISO string at one-second resolution.
+    Formatted at most once per second and reused in between.
+    """
+    global _timestamp_cache
+
+    now = time.time_ns() // 1_000_000_000
+    cached_second, cached = _timestamp_cache
+    if now != cached_second:
+        cached = datetime.fromtimestamp(now, timezone.utc).isoformat()
+        _timestamp_cache = (now, cached)
+    return cached
+
+
 def enrich_memory_context(content: str, conversation_context: Optional[str] = None) -> str:
     """
     Enrich memory with additional context to make it more useful.
     """
     # Add timestamp context
-    timestamp = datetime.now(timezone.utc).isoformat()
+    timestamp = _utc_timestamp()
 
     # Basic enrichment - ensure memory is self-contained
     enriched = content
 
     # If content doesn't mention "user", add clarity
-    if "prefer" in content.lower() and "user" not in content.lower():
+    content_lower = content.lower()
+    if "prefer" in content_lower and "user" not in content_lower:
         enriched = f"User preference: {content}"
 
     # Add metadata footer
@@ -152,25 +348,55 @@ def enrich_memory_context(content: str, conversation_context: Optional[str] = No
 # KEYWORD RERANKING & CONTEXT FORMATTING
 # ─────────────────────────
 
-def rerank_by_keywords(memories: list, query: str, boost: float = 0.15) -> list:
+def query_keywords(query: str) -> frozenset[str]:
+    """
+    Keywords used for reranking: the query's tokens minus stopwords.
+    """
+    return frozenset(_tokens(query)) - STOPWORDS
+
+
+def merge_search_results(result_lists: list) -> list:
+    """
+    Merge results from several searches, keeping each memory once
+    with the best score it got in any of them.
+    """
+    if len(result_lists) == 1:
+        return result_lists[0] or []
+
+    merged = {}
+    for results in result_lists:
+        for mem in results or []:
+            if not isinstance(mem, dict) or mem.get("id") is None:
+                merged[id(mem)] = mem
+                continue
+
+            seen = merged.get(mem["id"])
+            if seen is None or mem.get("score", 0) > seen.get("score", 0):
+                merged[mem["id"]] = mem
+
+    return list(merged.values())
+
+
+def rerank_by_keywords(memories: list, keywords: frozenset[str], boost: float = 0.15) -> list:
     """
     Rerank memories by keyword matching from the query.
     Boosts semantic search results with lexical matching.
+    Takes precomputed `query_keywords()` so they can be built before the search.
     """
-    keywords = set(query.lower().split())
-
+    # Scores live in a parallel list instead of being written into each memory
+    scores = []
     for mem in memories:
-        if not isinstance(mem, dict):
-            continue
-
-        content = mem.get("memory", "").lower()
-        # Count keyword matches
-        matches = sum(1 for kw in keywords if kw in content)
-        # Boost score by 15% per keyword match
-        base_score = mem.get("score", 0.5)
-        mem["_rerank_score"] = base_score * (1 + (matches * boost))
+        try:
+            # Count whole-word keyword matches
+            matches = len(keywords.intersection(_tokens(mem.get("memory", ""))))
+            # Boost score by 15% per keyword match
+            scores.append(mem.get("score", 0.5) * (1 + (matches * boost)))
+        except (AttributeError, TypeError):
+            # Not a memory dict; rank it last
+            scores.append(0.0)
 
-    return sorted(memories, key=lambda x: x.get("_rerank_score", 0), reverse=True)
+    order = sorted(range(len(memories)), key=scores.__getitem__, reverse=True)
+    return [memories[i] for i in order]
 
 
 def format_context_for_llm(memories: list) -> str:
@@ -182,53 +408,142 @@ def format_context_for_llm(memories: list) -> str:
         return ""
 
     # Group by category for better organization
-    by_category = {}
+    by_category: dict[str, list[str]] = defaultdict(list)
     for mem in memories:
-        if not isinstance(mem, dict):
+        try:
+            cats = mem.get("categories", ["general"])
+            cat = cats[0] if cats else "general"
+            by_category[cat].append(mem.get("memory", ""))
+        except (AttributeError, TypeError):
+            # Not a memory dict
             continue
 
-        cats = mem.get("categories", ["general"])
-        cat = cats[0] if cats else "general"
-        if cat not in by_category:
-            by_category[cat] = []
-        by_category[cat].append(mem.get("memory", ""))
-
     # Build formatted context
     lines = ["## User Context\n"]
 
     for category, mems in by_category.items():
         category_title = category.replace("_", " ").title()
         lines.append(f"### {category_title}")
-        for mem_text in mems:
-            lines.append(f"- {mem_text}")
+        lines.extend([f"- {mem_text}" for mem_text in mems])
         lines.append("")
 
     return "\n".join(lines)
 
 
+# ─────────────────────────
+# RESULT CACHES
+# ─────────────────────────
+
+class TTLCache:
+    """
+    Per-user LRU cache with a TTL. Backs the search, auto-recall and
+    consolidation caches, so repeated work skips the Mem0 round trip.
+    """
+
+    def __init__(self, maxsize: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: dict[str, OrderedDict] = {}
+
+    def get(self, user_id: str, key: Hashable) -> Optional[Any]:
+        entries = self._entries.get(user_id)
+        if not entries or key not in entries:
+            return None
+
+        stored_at, value = entries[key]
+        if time.monotonic() - stored_at > self.ttl:
+            del entries[key]
+            return None
+
+        entries.move_to_end(key)
+        return value
+
+    def put(self, user_id: str, key: Hashable, value: Any, age: float = 0.0) -> None:
+        entries = self._entries.setdefault(user_id, OrderedDict())
+        entries[key] = (time.monotonic() - age, value)
+        entries.move_to_end(key)
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Drop cached results for one user, or for everyone if no user is given."""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def items(self) -> Iterator[tuple[str, Hashable, float, Any]]:
+        """Yield (user_id, key, age in seconds, value) for every fresh entry."""
+        now = time.monotonic()
+        for user_id, entries in self._entries.items():
+            for key, (stored_at, value) in entries.items():
+                if now - stored_at <= self.ttl:
+                    yield user_id, key, now - stored_at, value
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for cache lookup. Only case and whitespace are
+    folded: Mem0 embeds the raw query, so word order and punctuation
+    ("C++" vs "C#") can change which memories it returns.
+    """
+    return " ".join(query.lower().split())
+
+
+search_cache = TTLCache()
+context_cache = TTLCache(ttl=CONTEXT_CACHE_TTL)
+
+
+def invalidate_caches(user_id: Optional[str] = None) -> None:
+    """
+    Drop cached search, auto-recall and consolidation results after a
+    write. Dropping consolidation results also keeps deleted text out of
+    the on-disk cache.
+    """
+    search_cache.invalidate(user_id)
+    context_cache.invalidate(user_id)
+    consolidation_cache.invalidate(user_id)
+
+
 # ─────────────────────────
 # DEDUPLICATION
 # ─────────────────────────
 
-async def find_similar_memories(content: str, user_id: str, limit: int = 5) -> list[dict]:
+async def find_similar_memories(
+    content: str,
+    user_id: str,
+    limit: int = 5,
+    tokens: Optional[tuple[str, ...]] = None
+) -> list[dict]:
     """
     Search for similar memories to avoid duplicates.
     Uses Mem0's semantic search.
+    Pass `tokens` if the caller has already tokenized the content.
     """
+    # Too short to be worth a round trip (only reachable with force=True)
+    if len(content) < MIN_MEMORY_LENGTH:
+        return []
+
     try:
-        # Extract key terms for search
-        words = content.lower().split()
-        # Remove common words
-        stopwords = {"the", "a", "an", "is", "are", "was", "were", "in", "on", "at", "to", "for"}
-        key_terms = [w for w in words if w not in stopwords]
+        # Extract key terms for search, dropping common words
+        if tokens is None:
+            tokens = _tokens(content)
+        # Only the first five key terms are used, so stop scanning there
+        key_terms = []
+        for word in tokens:
+            if word not in STOPWORDS:
+                key_terms.append(word)
+                if len(key_terms) == 5:
+                    break
 
         if not key_terms:
             return []
 
         # Search using a subset of key terms
-        search_query = " ".join(key_terms[:5])
+        search_query = " ".join(key_terms)
 
-        results = mem0_client.search(
+        results = await call_mem0(
+            mem0_client.search,
             query=search_query,
             user_id=user_id,
             limit=limit
@@ -236,25 +551,272 @@ async def find_similar_memories(content: str, user_id: str, limit: int = 5) -> l
 
         return results if results else []
     except Exception as e:
-        print(f"Error searching for similar memories: {e}", file=__import__('sys').stderr)
+        log.warning("Error searching for similar memories: %s", e)
         return []
 
 
+# (user_id, tokens) of the last RECENT_ADDS_SIZE legacy-mode saves
+recent_adds: deque = deque(maxlen=RECENT_ADDS_SIZE)
+
+
+def find_duplicate(token_set: set, candidates: list) -> float:
+    """
+    Compare pre-tokenized content against search results, stopping at the
+    first one above SIMILARITY_THRESHOLD. Returns its similarity, or 0.0.
+    """
+    for mem in candidates:
+        try:
+            memory_content = mem.get("memory", "")
+            if not memory_content:
+                continue
+
+            similarity = _jaccard(token_set, set(_tokens(memory_content)))
+            if similarity > SIMILARITY_THRESHOLD:
+                return similarity
+        except AttributeError:
+            continue
+
+    return 0.0
+
+
 def calculate_similarity(text1: str, text2: str) -> float:
     """
     Calculate simple word-based similarity between two texts.
     Returns a score between 0 and 1.
     """
-    words1 = set(text1.lower().split())
-    words2 = set(text2.lower().split())
+    return _jaccard(set(_tokens(text1)), set(_tokens(text2)))
 
-    if not words1 or not words2:
+
+def _jaccard(words1: set, words2: set) -> float:
+    """
+    Jaccard similarity of two pre-tokenized word sets.
+    """
+    intersection = len(words1 & words2)
+    if not intersection:
         return 0.0
 
-    intersection = words1.intersection(words2)
-    union = words1.union(words2)
+    # |A ∪ B| = |A| + |B| - |A ∩ B|, no need to build the union set
+    return intersection / (len(words1) + len(words2) - intersection)
 
-    return len(intersection) / len(union) if union else 0.0
+
+def _compute_candidates(
+    all_memories: list, limit: int
+) -> tuple[list[ConsolidationCandidate], int]:
+    """
+    Find pairs of similar memories that are candidates for consolidation.
+    Candidate pairs come from an inverted index over each memory's rarest
+    words (prefix filtering), so most pairs are never compared; every
+    candidate is then checked with exact Jaccard similarity.
+
+    Only the ``limit`` most similar pairs are kept. Returns them along with
+    the number of pairs found in total.
+    """
+    # Tokenize each memory exactly once
+    word_sets = [set(_tokens(mem.get("memory", ""))) for mem in all_memories]
+
+    # Intern words as ints ranked rarest first, so sorting a memory's ids
+    # puts its most selective words at the front
+    doc_freq = Counter(word for words in word_sets for word in words)
+    vocab = {
+        word: rank
+        for rank, word in enumerate(sorted(doc_freq, key=lambda word: (doc_freq[word], word)))
+    }
+    token_sets = [frozenset(vocab[word] for word in words) for words in word_sets]
+    sizes = [len(tokens) for tokens in token_sets]
+    del word_sets
+
+    # token -> indices of earlier memories with it in their prefix, in ascending size
+    postings: list[list[int]] = [[] for _ in vocab]
+    # token -> first posting still large enough to reach the threshold
+    starts = [0] * len(vocab)
+    # Min-heap of the best pairs so far; the root is the first to be evicted
+    pairs = []
+    found = 0
+
+    # Visit memories smallest first. Jaccard can't exceed |small| / |large|,
+    # so once an indexed memory is too small for the current one it is too
+    # small for every later one as well and can be skipped for good.
+    for j in sorted(range(len(token_sets)), key=sizes.__getitem__):
+        tokens = token_sets[j]
+        min_size = CONSOLIDATION_THRESHOLD * sizes[j]
+
+        # Similarity above t needs more than t·|x| shared words, so two such
+        # memories must share one of their first |x| - floor(t·|x|) rarest words
+        prefix = sorted(tokens)[:sizes[j] - int(min_size)]
+
+        candidates = set()
+        for token in prefix:
+            seen = postings[token]
+            start = starts[token]
+            while start < len(seen) and sizes[seen[start]] <= min_size:
+                start += 1
+            starts[token] = start
+            candidates.update(seen[start:])
+            seen.append(j)
+
+        for i in candidates:
+            similarity = _jaccard(token_sets[i], tokens)
+            if similarity > CONSOLIDATION_THRESHOLD:
+                found += 1
+                # Ties go to the earlier pair, so evict the later one first
+                pair = (similarity, -min(i, j), -max(i, j))
+                if len(pairs) < limit:
+                    heapq.heappush(pairs, pair)
+                elif pair > pairs[0]:
+                    heapq.heapreplace(pairs, pair)
+
+    # Most similar first, then by position for a stable order
+    pairs = [(-neg_i, -neg_j, similarity) for similarity, neg_i, neg_j in sorted(pairs, reverse=True)]
+
+    candidates = [
+        ConsolidationCandidate(
+            memory1_id=all_memories[i].get("id"),
+            memory1_content=all_memories[i].get("memory", ""),
+            memory2_id=all_memories[j].get("id"),
+            memory2_content=all_memories[j].get("memory", ""),
+            similarity=round(similarity, 2),
+        )
+        for i, j, similarity in pairs
+    ]
+    return candidates, found
+
+
+def cluster_candidates(candidates: list[ConsolidationCandidate]) -> list[dict]:
+    """
+    Group candidate pairs into clusters of memories linked by a chain of
+    similar pairs (union-find), so A~B and B~C come back as one group.
+    Clusters keep the order of their most similar pair.
+    """
+    parent: dict[str, str] = {}
+    contents: dict[str, str] = {}
+
+    def find(memory_id: str) -> str:
+        root = parent.setdefault(memory_id, memory_id)
+        while root != parent[root]:
+            root = parent[root]
+        # Path compression
+        while memory_id != root:
+            parent[memory_id], memory_id = root, parent[memory_id]
+        return root
+
+    for cand in candidates:
+        contents[cand.memory1_id] = cand.memory1_content
+        contents[cand.memory2_id] = cand.memory2_content
+        root1, root2 = find(cand.memory1_id), find(cand.memory2_id)
+        if root1 != root2:
+            parent[root2] = root1
+
+    # Candidates are most similar first, so a cluster's first pair has its max
+    clusters: dict[str, dict] = {}
+    for cand in candidates:
+        cluster = clusters.setdefault(find(cand.memory1_id), {
+            "ids": [],
+            "max_similarity": cand.similarity,
+        })
+        for memory_id in (cand.memory1_id, cand.memory2_id):
+            if memory_id not in cluster["ids"]:
+                cluster["ids"].append(memory_id)
+
+    # The longest memory usually carries the most detail worth keeping
+    return [
+        {
+            "ids": cluster["ids"],
+            "representative_content": max((contents[i] for i in cluster["ids"]), key=len),
+            "max_similarity": cluster["max_similarity"],
+        }
+        for cluster in clusters.values()
+    ]
+
+
+def memory_fingerprint(all_memories: list) -> str:
+    """
+    Stable digest of a user's memory IDs and contents. Any add, update or
+    delete changes it, so it doubles as the consolidation cache key.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for mem in all_memories:
+        digest.update(f"{mem.get('id')}\x1f{mem.get('memory', '')}\x1e".encode())
+    return digest.hexdigest()
+
+
+# Last consolidation result per user, keyed by memory_fingerprint():
+# (top candidates, pairs found, how many pairs the scan kept)
+consolidation_cache = TTLCache(maxsize=1, ttl=CONSOLIDATION_CACHE_TTL)
+CONSOLIDATION_CACHE_FILE = os.path.join(CACHE_DIR, "consolidation.json") if CACHE_DIR else None
+
+
+def load_consolidation_cache() -> None:
+    """Restore consolidation results saved by a previous run, if still fresh."""
+    if not CONSOLIDATION_CACHE_FILE:
+        return
+    try:
+        with open(CONSOLIDATION_CACHE_FILE, "rb") as f:
+            saved = json.loads(f.read())
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable consolidation cache: %s", e)
+        return
+
+    now = time.time()
+    for entry in saved.get("entries", []):
+        try:
+            age = now - entry["saved_at"]
+            if 0 <= age <= CONSOLIDATION_CACHE_TTL:
+                consolidation_cache.put(
+                    entry["user_id"],
+                    entry["key"],
+                    (
+                        [ConsolidationCandidate(**c) for c in entry["candidates"]],
+                        entry["total"],
+                        entry["keep"],
+                    ),
+                    age=age,
+                )
+        except (KeyError, TypeError) as e:
+            log.warning("Skipping malformed consolidation cache entry: %s", e)
+
+
+def save_consolidation_cache() -> None:
+    """
+    Write consolidation results to disk, newest first, stopping once the
+    file would exceed CONSOLIDATION_CACHE_MAX_BYTES.
+    """
+    if not CONSOLIDATION_CACHE_FILE:
+        return
+    now = time.time()
+    cached = sorted(consolidation_cache.items(), key=lambda item: item[2])
+
+    records, size = [], 0
+    for user_id, key, age, (candidates, total, keep) in cached:
+        record = _dump({
+            "user_id": user_id,
+            "key": key,
+            "saved_at": now - age,
+            "candidates": candidates,
+            "total": total,
+            "keep": keep,
+        })
+        size += len(record.encode()) + 1
+        if size > CONSOLIDATION_CACHE_MAX_BYTES:
+            break
+        records.append(record)
+
+    try:
+        # The file holds memory contents, so keep it private to this user
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        # Write then rename, so a crash mid-write never leaves a torn file
+        tmp_path = CONSOLIDATION_CACHE_FILE + ".tmp"
+        try:
+            os.unlink(tmp_path)  # A leftover could carry looser permissions
+        except FileNotFoundError:
+            pass
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write('{"entries":[' + ",".join(records) + "]}")
+        os.replace(tmp_path, CONSOLIDATION_CACHE_FILE)
+    except OSError as e:
+        log.warning("Could not save consolidation cache: %s", e)
 
 
 # ─────────────────────────
@@ -264,247 +826,263 @@ def calculate_similarity(text1: str, text2: str) -> float:
 app = Server("mem0-cathedral-mcp-v12")
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """
-    List available memory tools.
-    """
-    return [
-        Tool(
-            name="add-memory",
-            description=(
-                "💾 Save important information to long-term memory with AI extraction. "
-                "Supports TWO MODES: (1) AI Extraction - pass 'messages' array for automatic extraction, "
-                "(2) Manual - pass 'content' string (legacy). "
-                "⚠️ SILENT OPERATION: Returns minimal response {success: true/false}. "
-                "DO NOT mention saving memories in chat unless explicitly asked."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "messages": {
-                        "type": "array",
-                        "description": (
-                            "Conversation messages for AI extraction (RECOMMENDED). "
-                            "Format: [{'role': 'user', 'content': '...'}, {'role': 'assistant', 'content': '...'}]. "
-                            "Mem0's AI automatically extracts multiple memories."
-                        ),
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "role": {"type": "string"},
-                                "content": {"type": "string"}
-                            }
-                        }
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": (
-                            "Pre-extracted memory content (LEGACY MODE). "
-                            "Use 'messages' for better AI extraction."
-                        ),
-                    },
-                    "userId": {
-                        "type": "string",
-                        "description": f"User ID (default: {DEFAULT_USER_ID})",
-                    },
-                    "agentId": {
-                        "type": "string",
-                        "description": "AI agent identifier for multi-agent systems",
-                    },
-                    "runId": {
-                        "type": "string",
-                        "description": "Conversation session ID for tracking specific interactions",
-                    },
-                    "customCategories": {
-                        "type": "object",
-                        "description": "Custom memory categories with descriptions (overrides defaults)",
-                    },
-                    "customInstructions": {
-                        "type": "string",
-                        "description": "Custom extraction instructions to guide Mem0's AI",
-                    },
-                    "metadata": {
+# Tool definitions never change at runtime, so build them once at import
+TOOLS: list[Tool] = [
+    Tool(
+        name="add-memory",
+        description=(
+            "💾 Save important information to long-term memory with AI extraction. "
+            "Supports TWO MODES: (1) AI Extraction - pass 'messages' array for automatic extraction, "
+            "(2) Manual - pass 'content' string (legacy). "
+            "⚠️ SILENT OPERATION: Returns minimal response {success: true/false}. "
+            "DO NOT mention saving memories in chat unless explicitly asked."
+        ),
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "messages": {
+                    "type": "array",
+                    "description": (
+                        "Conversation messages for AI extraction (RECOMMENDED). "
+                        "Format: [{'role': 'user', 'content': '...'}, {'role': 'assistant', 'content': '...'}]. "
+                        "Mem0's AI automatically extracts multiple memories."
+                    ),
+                    "items": {
                         "type": "object",
-                        "description": "Structured metadata (location, tags, etc.)",
-                    },
-                    "enableGraph": {
-                        "type": "boolean",
-                        "description": "Build entity relationships for contextual retrieval. (Requires Mem0 PRO)",
-                    },
-                    "includes": {
-                        "type": "string",
-                        "description": "Focus extraction on specific topics",
-                    },
-                    "excludes": {
-                        "type": "string",
-                        "description": "Exclude specific patterns from extraction",
-                    },
-                    "force": {
-                        "type": "boolean",
-                        "description": "Bypass quality checks in legacy content mode",
+                        "properties": {
+                            "role": {"type": "string"},
+                            "content": {"type": "string"}
+                        }
                     }
                 },
+                "content": {
+                    "type": "string",
+                    "description": (
+                        "Pre-extracted memory content (LEGACY MODE). "
+                        "Use 'messages' for better AI extraction."
+                    ),
+                },
+                "userId": {
+                    "type": "string",
+                    "description": f"User ID (default: {DEFAULT_USER_ID})",
+                },
+                "agentId": {
+                    "type": "string",
+                    "description": "AI agent identifier for multi-agent systems",
+                },
+                "runId": {
+                    "type": "string",
+                    "description": "Conversation session ID for tracking specific interactions",
+                },
+                "customCategories": {
+                    "type": "object",
+                    "description": "Custom memory categories with descriptions (overrides defaults)",
+                },
+                "customInstructions": {
+                    "type": "string",
+                    "description": "Custom extraction instructions to guide Mem0's AI",
+                },
+                "metadata": {
+                    "type": "object",
+                    "description": "Structured metadata (location, tags, etc.)",
+                },
+                "enableGraph": {
+                    "type": "boolean",
+                    "description": "Build entity relationships for contextual retrieval. (Requires Mem0 PRO)",
+                },
+                "includes": {
+                    "type": "string",
+                    "description": "Focus extraction on specific topics",
+                },
+                "excludes": {
+                    "type": "string",
+                    "description": "Exclude specific patterns from extraction",
+                },
+                "force": {
+                    "type": "boolean",
+                    "description": "Bypass quality checks in legacy content mode",
+                }
             },
+        },
+    ),
+    Tool(
+        name="get-context",
+        description=(
+            "🧠 Intelligent auto-recall: Get relevant memories for current conversation. "
+            "Call this PROACTIVELY at conversation start or when context would help. "
+            "Uses semantic search + keyword reranking for better relevance. "
+            "⚠️ SILENT OPERATION: Do NOT mention or cite this function call in responses."
         ),
-        Tool(
-            name="get-context",
-            description=(
-                "🧠 Intelligent auto-recall: Get relevant memories for current conversation. "
-                "Call this PROACTIVELY at conversation start or when context would help. "
-                "Uses semantic search + keyword reranking for better relevance. "
-                "⚠️ SILENT OPERATION: Do NOT mention or cite this function call in responses."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "currentMessage": {
-                        "type": "string",
-                        "description": "The user's current message to find relevant context for",
-                    },
-                    "recentMessages": {
-                        "type": "array",
-                        "description": "Recent conversation messages for better context understanding",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "role": {"type": "string"},
-                                "content": {"type": "string"}
-                            }
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "currentMessage": {
+                    "type": "string",
+                    "description": "The user's current message to find relevant context for",
+                },
+                "recentMessages": {
+                    "type": "array",
+                    "description": "Recent conversation messages for better context understanding",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "role": {"type": "string"},
+                            "content": {"type": "string"}
                         }
-                    },
-                    "userId": {
-                        "type": "string",
-                        "description": f"User ID (default: {DEFAULT_USER_ID})",
-                    },
-                    "agentId": {
-                        "type": "string",
-                        "description": "Filter by specific AI agent",
-                    },
-                    "maxMemories": {
-                        "type": "number",
-                        "description": "Maximum relevant memories to return (1-20, default: 10)",
-                    },
-                    "enableGraph": {
-                        "type": "boolean",
-                        "description": "Include entity relationships for better context. (Requires Mem0 PRO)",
-                    },
-                },
-                "required": ["currentMessage"],
+                    }
+                },
+                "userId": {
+                    "type": "string",
+                    "description": f"User ID (default: {DEFAULT_USER_ID})",
+                },
+                "agentId": {
+                    "type": "string",
+                    "description": "Filter by specific AI agent",
+                },
+                "maxMemories": {
+                    "type": "number",
+                    "description": "Maximum relevant memories to return (1-20, default: 10)",
+                },
+                "enableGraph": {
+                    "type": "boolean",
+                    "description": "Include entity relationships for better context. (Requires Mem0 PRO)",
+                },
             },
+            "required": ["currentMessage"],
+        },
+    ),
+    Tool(
+        name="search-memories",
+        description=(
+            "🔍 Search memories with semantic understanding and category filtering. "
+            "Use broad, natural queries like 'preferences' or 'python projects'. "
+            "Supports category filtering and graph relationships."
         ),
-        Tool(
-            name="search-memories",
-            description=(
-                "🔍 Search memories with semantic understanding and category filtering. "
-                "Use broad, natural queries like 'preferences' or 'python projects'. "
-                "Supports category filtering and graph relationships."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Natural language search query",
-                    },
-                    "userId": {
-                        "type": "string",
-                        "description": f"User ID (default: {DEFAULT_USER_ID})",
-                    },
-                    "agentId": {
-                        "type": "string",
-                        "description": "Filter by specific AI agent",
-                    },
-                    "runId": {
-                        "type": "string",
-                        "description": "Filter by specific conversation session",
-                    },
-                    "limit": {
-                        "type": "number",
-                        "description": "Max results (default: 10, max: 100)",
-                    },
-                    "categories": {
-                        "type": "array",
-                        "description": "Filter by memory categories",
-                        "items": {"type": "string"}
-                    },
-                    "enableGraph": {
-                        "type": "boolean",
-                        "description": "Include entity relationships in search results. (Requires Mem0 PRO)",
-                    },
-                },
-                "required": ["query"],
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Natural language search query",
+                },
+                "userId": {
+                    "type": "string",
+                    "description": f"User ID (default: {DEFAULT_USER_ID})",
+                },
+                "agentId": {
+                    "type": "string",
+                    "description": "Filter by specific AI agent",
+                },
+                "runId": {
+                    "type": "string",
+                    "description": "Filter by specific conversation session",
+                },
+                "limit": {
+                    "type": "number",
+                    "description": "Max results (default: 10, max: 100)",
+                },
+                "categories": {
+                    "type": "array",
+                    "description": "Filter by memory categories",
+                    "items": {"type": "string"}
+                },
+                "enableGraph": {
+                    "type": "boolean",
+                    "description": "Include entity relationships in search results. (Requires Mem0 PRO)",
+                },
             },
+            "required": ["query"],
+        },
+    ),
+    Tool(
+        name="get-all-memories",
+        description=(
+            "Retrieve ALL memories for a user. Use this at conversation start to load context, "
+            "or when user asks 'what do you know about me?' or 'show me everything you remember'."
         ),
-        Tool(
-            name="get-all-memories",
-            description=(
-                "Retrieve ALL memories for a user. Use this at conversation start to load context, "
-                "or when user asks 'what do you know about me?' or 'show me everything you remember'."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "userId": {
-                        "type": "string",
-                        "description": f"User ID (default: {DEFAULT_USER_ID})",
-                    },
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "userId": {
+                    "type": "string",
+                    "description": f"User ID (default: {DEFAULT_USER_ID})",
                 },
             },
-        ),
-        Tool(
-            name="update-memory",
-            description="Update an existing memory when information changes or needs correction.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "memoryId": {
-                        "type": "string",
-                        "description": "ID of memory to update",
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "New memory content",
-                    },
-                },
-                "required": ["memoryId", "content"],
+        },
+    ),
+    Tool(
+        name="update-memory",
+        description="Update an existing memory when information changes or needs correction.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "memoryId": {
+                    "type": "string",
+                    "description": "ID of memory to update",
+                },
+                "content": {
+                    "type": "string",
+                    "description": "New memory content",
+                },
             },
-        ),
-        Tool(
-            name="delete-memory",
-            description="Permanently delete a specific memory. Use when user explicitly asks to forget something.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "memoryId": {
-                        "type": "string",
-                        "description": "ID of memory to delete",
-                    },
-                },
-                "required": ["memoryId"],
+            "required": ["memoryId", "content"],
+        },
+    ),
+    Tool(
+        name="delete-memory",
+        description="Permanently delete a specific memory. Use when user explicitly asks to forget something.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "memoryId": {
+                    "type": "string",
+                    "description": "ID of memory to delete",
+                },
             },
+            "required": ["memoryId"],
+        },
+    ),
+    Tool(
+        name="consolidate-memories",
+        description=(
+            "Merge similar or redundant memories to improve quality. "
+            "Use when you notice duplicate information or want to clean up memory storage."
         ),
-        Tool(
-            name="consolidate-memories",
-            description=(
-                "Merge similar or redundant memories to improve quality. "
-                "Use when you notice duplicate information or want to clean up memory storage."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "userId": {
-                        "type": "string",
-                        "description": f"User ID (default: {DEFAULT_USER_ID})",
-                    },
-                    "dryRun": {
-                        "type": "boolean",
-                        "description": "Preview consolidation without making changes",
-                    },
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "userId": {
+                    "type": "string",
+                    "description": f"User ID (default: {DEFAULT_USER_ID})",
+                },
+                "dryRun": {
+                    "type": "boolean",
+                    "description": "Preview consolidation without making changes",
+                },
+                "maxCandidates": {
+                    "type": "number",
+                    "description": "Max candidate pairs to return, most similar first (default: 100)",
+                },
+                "offset": {
+                    "type": "number",
+                    "description": "Skip this many candidate pairs, for paging with next_offset (default: 0)",
+                },
+                "verbose": {
+                    "type": "boolean",
+                    "description": "Also return the individual candidate pairs (default: false)",
                 },
             },
-        ),
-    ]
+        },
+    ),
+]
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """
+    List available memory tools.
+    """
+    return TOOLS
 
 
 @app.call_tool()
@@ -513,30 +1091,18 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     Handle tool calls.
     """
     try:
-        if name == "add-memory":
-            return await handle_add_memory(arguments)
-        elif name == "get-context":
-            return await handle_get_context(arguments)
-        elif name == "search-memories":
-            return await handle_search_memories(arguments)
-        elif name == "get-all-memories":
-            return await handle_get_all_memories(arguments)
-        elif name == "update-memory":
-            return await handle_update_memory(arguments)
-        elif name == "delete-memory":
-            return await handle_delete_memory(arguments)
-        elif name == "consolidate-memories":
-            return await handle_consolidate_memories(arguments)
-        else:
+        handler = HANDLERS.get(name)
+        if handler is None:
             raise ValueError(f"Unknown tool: {name}")
+        return await handler(arguments)
     except Exception as e:
         return [
             TextContent(
                 type="text",
-                text=json.dumps({
+                text=_dump({
                     "error": str(e),
                     "tool": name
-                }, indent=2)
+                })
             )
         ]
 
@@ -547,27 +1113,26 @@ async def handle_add_memory(args: dict) -> list[TextContent]:
     1. AI Extraction Mode (recommended): Pass 'messages' array, Mem0 extracts automatically
     2. Legacy Mode: Pass 'content' string with manual quality checks
     """
-    import sys
-
-    messages = args.get("messages")
-    content = args.get("content")
-    user_id = args.get("userId", DEFAULT_USER_ID)
-    agent_id = args.get("agentId")
-    run_id = args.get("runId")
-    custom_categories = args.get("customCategories")
-    custom_instructions = args.get("customInstructions")
-    metadata = args.get("metadata", {})
-    enable_graph = args.get("enableGraph", False)
-    includes = args.get("includes")
-    excludes = args.get("excludes")
-    force = args.get("force", False)
+    get = args.get
+    messages = get("messages")
+    content = get("content")
+    user_id = get("userId", DEFAULT_USER_ID)
+    agent_id = get("agentId")
+    run_id = get("runId")
+    custom_categories = get("customCategories")
+    custom_instructions = get("customInstructions")
+    metadata = get("metadata", {})
+    enable_graph = get("enableGraph", False)
+    includes = get("includes")
+    excludes = get("excludes")
+    force = get("force", False)
 
     if not messages and not content:
-        return [TextContent(type="text", text=json.dumps({"success": False, "error": "Either 'messages' or 'content' required"}))]
+        return [TextContent(type="text", text=_dump({"success": False, "error": "Either 'messages' or 'content' required"}))]
 
     # Validate graph feature availability
     if enable_graph and not ENABLE_GRAPH_FEATURES:
-        return [TextContent(type="text", text=json.dumps({
+        return [TextContent(type="text", text=_dump({
             "success": False,
             "error": "Graph features require Mem0 PRO subscription. Set ENABLE_GRAPH_FEATURES=true if you have PRO access."
         }))]
@@ -577,7 +1142,7 @@ async def handle_add_memory(args: dict) -> list[TextContent]:
         # Build enriched metadata
         enriched_metadata = metadata.copy() if metadata else {}
         enriched_metadata.update({
-            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "captured_at": _utc_timestamp(),
             "source": "cathedral_mcp",
             "api_version": VERSION,
             "extraction_mode": "ai_powered"
@@ -610,59 +1175,61 @@ async def handle_add_memory(args: dict) -> list[TextContent]:
             payload["custom_instructions"] = custom_instructions
 
         try:
-            result = mem0_client.add(**payload)
+            result = await call_mem0(mem0_client.add, **payload)
+            invalidate_caches(user_id)
 
             # SILENT SUCCESS - Return minimal response
-            return [TextContent(type="text", text=json.dumps({"success": True}))]
+            return [TextContent(type="text", text=_dump({"success": True}))]
         except Exception as e:
-            print(f"Mem0 AI extraction error: {e}", file=sys.stderr)
+            log.error("Mem0 AI extraction error: %s", e)
             # SILENT FAILURE
-            return [TextContent(type="text", text=json.dumps({"success": False}))]
+            return [TextContent(type="text", text=_dump({"success": False}))]
 
     # MODE 2: LEGACY CONTENT MODE (Backward Compatible)
     else:
-        quality = assess_memory_quality(content)
+        # Tokenize once and share it across the quality, search and dedup steps
+        tokens = _tokens(content)
+        token_set = set(tokens)
+
+        quality = assess_memory_quality(content, tokens)
 
         if not force and not quality["should_save"]:
             # SILENT REJECTION - Just return failure (don't expose details to user)
-            print(f"Memory rejected: {quality['issues']}", file=sys.stderr)
-            return [TextContent(type="text", text=json.dumps({"success": False}))]
+            log.info("Memory rejected: %s", quality["issues"])
+            return [TextContent(type="text", text=_dump({"success": False}))]
+
+        # Exact repeat of something just saved: reject without a round trip
+        recent_key = (user_id, tokens)
+        if recent_key in recent_adds:
+            log.info("Duplicate detected (repeat of a recent add)")
+            return [TextContent(type="text", text=_dump({"success": False}))]
 
         # Check for duplicates
-        similar = await find_similar_memories(content, user_id)
-        if similar:
-            for mem in similar:
-                try:
-                    if not isinstance(mem, dict):
-                        continue
-
-                    memory_content = mem.get("memory", "")
-                    if not memory_content:
-                        continue
-
-                    similarity = calculate_similarity(content, memory_content)
-                    if similarity > SIMILARITY_THRESHOLD:
-                        # SILENT DUPLICATE REJECTION
-                        print(f"Duplicate detected (similarity: {similarity:.2f})", file=sys.stderr)
-                        return [TextContent(type="text", text=json.dumps({"success": False}))]
-                except AttributeError:
-                    continue
+        similar = await find_similar_memories(content, user_id, tokens=tokens)
+        similarity = find_duplicate(token_set, similar)
+        if similarity:
+            # SILENT DUPLICATE REJECTION
+            log.info("Duplicate detected (similarity: %.2f)", similarity)
+            return [TextContent(type="text", text=_dump({"success": False}))]
 
         # Enrich content
         enriched_content = enrich_memory_context(content)
 
         # Save to Mem0
         try:
-            result = mem0_client.add(
+            result = await call_mem0(
+                mem0_client.add,
                 messages=[{"role": "user", "content": enriched_content}],
                 user_id=user_id
             )
+            invalidate_caches(user_id)
+            recent_adds.append(recent_key)
 
             # SILENT SUCCESS
-            return [TextContent(type="text", text=json.dumps({"success": True}))]
+            return [TextContent(type="text", text=_dump({"success": True}))]
         except Exception as e:
-            print(f"Mem0 save error: {e}", file=sys.stderr)
-            return [TextContent(type="text", text=json.dumps({"success": False}))]
+            log.error("Mem0 save error: %s", e)
+            return [TextContent(type="text", text=_dump({"success": False}))]
 
 
 async def handle_get_context(args: dict) -> list[TextContent]:
@@ -670,19 +1237,20 @@ async def handle_get_context(args: dict) -> list[TextContent]:
     Intelligent auto-recall: Searches memories using current message + recent context.
     Returns top relevant memories formatted for LLM context injection.
     """
+    get = args.get
     current_message = args["currentMessage"]
-    recent_messages = args.get("recentMessages", [])
-    user_id = args.get("userId", DEFAULT_USER_ID)
-    agent_id = args.get("agentId")
-    max_memories = args.get("maxMemories", 10)
-    enable_graph = args.get("enableGraph", False)
+    recent_messages = get("recentMessages", [])
+    user_id = get("userId", DEFAULT_USER_ID)
+    agent_id = get("agentId")
+    max_memories = get("maxMemories", 10)
+    enable_graph = get("enableGraph", False)
 
     # Validate graph feature availability
     if enable_graph and not ENABLE_GRAPH_FEATURES:
         return [
             TextContent(
                 type="text",
-                text=json.dumps({
+                text=_dump({
                     "context": "",
                     "memories": [],
                     "count": 0,
@@ -694,35 +1262,55 @@ async def handle_get_context(args: dict) -> list[TextContent]:
     # Cap max_memories
     max_memories = min(max_memories, 20)
 
-    # Build search query from current message + recent context
-    search_query = current_message
+    # Prepare rerank keywords up front so only ranking is left after the search
+    keywords = query_keywords(current_message)
+
+    # Recent context (last 3 messages) is searched separately from the current message
+    recent_context = ""
     if recent_messages:
         recent_context = " ".join([
             msg.get("content", "")[:100]
-            for msg in recent_messages[-3:]  # Last 3 messages
+            for msg in recent_messages[-3:]
         ])
-        search_query = f"{current_message} {recent_context}"
 
-    # Search with reranking strategy: get 3x results, return top N
+    # Search with reranking strategy: get 3x results, return top N.
+    # With recent context the budget is split 2:1 across two concurrent searches.
     retrieve_limit = min(max_memories * 3, 60)
+    queries = [(current_message[:200], retrieve_limit)]  # Truncate long queries
+    if recent_context.strip():
+        queries = [
+            (current_message[:200], min(max_memories * 2, 40)),
+            (recent_context[:200], max_memories),
+        ]
 
     try:
-        # Build search parameters
-        search_params = {
-            "query": search_query[:200],  # Truncate long queries
-            "user_id": user_id,
-            "limit": retrieve_limit
-        }
+        # Repeated recall for the same conversation state skips Mem0 entirely
+        cache_key = (
+            tuple(normalize_query(query) for query, _ in queries),
+            keywords, agent_id, max_memories
+        )
+        cached = context_cache.get(user_id, cache_key)
+        if cached is not None:
+            return [TextContent(type="text", text=cached)]
+
+        searches = []
+        for query, limit in queries:
+            # Build search parameters
+            search_params = {
+                "query": query,
+                "user_id": user_id,
+                "limit": limit
+            }
 
-        if agent_id:
-            search_params["agent_id"] = agent_id
+            if agent_id:
+                search_params["agent_id"] = agent_id
 
-        results = mem0_client.search(**search_params)
+            searches.append(call_mem0(mem0_client.search, **search_params))
 
-        memories = results if results else []
+        memories = merge_search_results(await asyncio.gather(*searches))
 
         # Rerank by keyword matching with current message
-        memories = rerank_by_keywords(memories, current_message)
+        memories = rerank_by_keywords(memories, keywords)
 
         # Take top N after reranking
         top_memories = memories[:max_memories]
@@ -730,26 +1318,23 @@ async def handle_get_context(args: dict) -> list[TextContent]:
         # Format for LLM context
         context_string = format_context_for_llm(top_memories)
 
-        return [
-            TextContent(
-                type="text",
-                text=json.dumps({
-                    "context": context_string,
-                    "memories": top_memories,
-                    "count": len(top_memories),
-                    "total_searched": len(memories)
-                }, indent=2)
-            )
-        ]
+        response = _dump({
+            "context": context_string,
+            "memories": top_memories,
+            "count": len(top_memories),
+            "total_searched": len(memories)
+        })
+        context_cache.put(user_id, cache_key, response)
+
+        return [TextContent(type="text", text=response)]
 
     except Exception as e:
-        import sys
-        print(f"Auto-recall error: {e}", file=sys.stderr)
+        log.error("Auto-recall error: %s", e)
         # Return empty context on error (silent failure)
         return [
             TextContent(
                 type="text",
-                text=json.dumps({
+                text=_dump({
                     "context": "",
                     "memories": [],
                     "count": 0,
@@ -761,24 +1346,25 @@ async def handle_get_context(args: dict) -> list[TextContent]:
 
 async def handle_search_memories(args: dict) -> list[TextContent]:
     """Search memories with semantic search, category filtering, and graph support."""
+    get = args.get
     query = args["query"]
-    user_id = args.get("userId", DEFAULT_USER_ID)
-    agent_id = args.get("agentId")
-    run_id = args.get("runId")
-    limit = args.get("limit", 10)
-    categories = args.get("categories")
-    enable_graph = args.get("enableGraph", False)
+    user_id = get("userId", DEFAULT_USER_ID)
+    agent_id = get("agentId")
+    run_id = get("runId")
+    limit = get("limit", 10)
+    categories = get("categories")
+    enable_graph = get("enableGraph", False)
 
     # Validate graph feature availability
     if enable_graph and not ENABLE_GRAPH_FEATURES:
         return [
             TextContent(
                 type="text",
-                text=json.dumps({
+                text=_dump({
                     "results": [],
                     "count": 0,
                     "error": "Graph features require Mem0 PRO subscription. Set ENABLE_GRAPH_FEATURES=true if you have PRO access."
-                }, indent=2)
+                })
             )
         ]
 
@@ -801,25 +1387,23 @@ async def handle_search_memories(args: dict) -> list[TextContent]:
     if enable_graph:
         search_params["enable_graph"] = True
 
-    results = mem0_client.search(**search_params)
+    # Serve repeated queries from the cache
+    cache_key = (
+        normalize_query(query), agent_id, run_id, limit,
+        tuple(categories) if categories else None, enable_graph
+    )
+    results = search_cache.get(user_id, cache_key)
+    if results is None:
+        results = await call_mem0(mem0_client.search, **search_params)
+        search_cache.put(user_id, cache_key, results)
 
     # Format results for better readability
-    formatted_results = []
-    if results:
-        for mem in results:
-            formatted_results.append({
-                "id": mem.get("id"),
-                "content": mem.get("memory"),
-                "categories": mem.get("categories", []),
-                "created_at": mem.get("created_at"),
-                "updated_at": mem.get("updated_at"),
-                "score": mem.get("score"),
-            })
+    formatted_results = [SearchHit.from_mem0(mem) for mem in results or []]
 
     return [
         TextContent(
             type="text",
-            text=json.dumps({
+            text=_dump({
                 "results": formatted_results,
                 "count": len(formatted_results),
                 "query": query,
@@ -830,7 +1414,7 @@ async def handle_search_memories(args: dict) -> list[TextContent]:
                     "categories": categories,
                     "graph_enabled": enable_graph
                 }
-            }, indent=2)
+            })
         )
     ]
 
@@ -839,26 +1423,19 @@ async def handle_get_all_memories(args: dict) -> list[TextContent]:
     """Get all memories for a user."""
     user_id = args.get("userId", DEFAULT_USER_ID)
 
-    memories = mem0_client.get_all(user_id=user_id)
-
-    # Format results
-    formatted = []
-    if memories:
-        for mem in memories:
-            formatted.append({
-                "id": mem.get("id"),
-                "content": mem.get("memory"),
-                "created_at": mem.get("created_at"),
-                "updated_at": mem.get("updated_at"),
-            })
+    memories = await call_mem0(mem0_client.get_all, user_id=user_id)
+
+    # Format results in one pass, then release the raw records before encoding
+    formatted = [MemoryView.from_mem0(mem) for mem in memories or []]
+    del memories
 
     return [
         TextContent(
             type="text",
-            text=json.dumps({
+            text=await _dump_large({
                 "memories": formatted,
                 "total": len(formatted),
-            }, indent=2)
+            }, len(formatted))
         )
     ]
 
@@ -868,19 +1445,24 @@ async def handle_update_memory(args: dict) -> list[TextContent]:
     memory_id = args["memoryId"]
     content = args["content"]
 
-    result = mem0_client.update(
+    result = await call_mem0(
+        mem0_client.update,
         memory_id=memory_id,
         data=content
     )
+    # Memory IDs aren't scoped to a user here, so drop every cached search
+    invalidate_caches()
+    # The old text is gone, so saving it again is no longer a repeat
+    recent_adds.clear()
 
     return [
         TextContent(
             type="text",
-            text=json.dumps({
+            text=_dump({
                 "ok": True,
                 "memory_id": memory_id,
                 "message": "Memory updated successfully",
-            }, indent=2)
+            })
         )
     ]
 
@@ -889,16 +1471,18 @@ async def handle_delete_memory(args: dict) -> list[TextContent]:
     """Delete a memory."""
     memory_id = args["memoryId"]
 
-    mem0_client.delete(memory_id=memory_id)
+    await call_mem0(mem0_client.delete, memory_id=memory_id)
+    invalidate_caches()
+    recent_adds.clear()
 
     return [
         TextContent(
             type="text",
-            text=json.dumps({
+            text=_dump({
                 "ok": True,
                 "memory_id": memory_id,
                 "message": "Memory deleted successfully",
-            }, indent=2)
+            })
         )
     ]
 
@@ -907,79 +1491,104 @@ async def handle_consolidate_memories(args: dict) -> list[TextContent]:
     """Find and merge similar memories."""
     user_id = args.get("userId", DEFAULT_USER_ID)
     dry_run = args.get("dryRun", True)
+    max_candidates = max(1, int(args.get("maxCandidates", 100)))
+    offset = max(0, int(args.get("offset", 0)))
+    verbose = args.get("verbose", False)
 
     # Get all memories
-    all_memories = mem0_client.get_all(user_id=user_id)
+    all_memories = await call_mem0(mem0_client.get_all, user_id=user_id)
 
     if not all_memories:
         return [
             TextContent(
                 type="text",
-                text=json.dumps({
+                text=_dump({
                     "ok": True,
                     "message": "No memories to consolidate",
-                }, indent=2)
+                })
             )
         ]
 
-    # Find similar pairs
-    consolidation_candidates = []
-    checked = set()
-
-    for i, mem1 in enumerate(all_memories):
-        for j, mem2 in enumerate(all_memories[i+1:], start=i+1):
-            pair_key = f"{i}-{j}"
-            if pair_key in checked:
-                continue
-
-            checked.add(pair_key)
-
-            content1 = mem1.get("memory", "")
-            content2 = mem2.get("memory", "")
-
-            similarity = calculate_similarity(content1, content2)
-
-            if similarity > 0.7:  # Lower threshold for consolidation
-                consolidation_candidates.append({
-                    "memory1_id": mem1.get("id"),
-                    "memory1_content": content1,
-                    "memory2_id": mem2.get("id"),
-                    "memory2_content": content2,
-                    "similarity": round(similarity, 2),
-                })
+    # Find similar pairs off the event loop, unless nothing changed since last run
+    # Later pages still need the scan to keep every pair before them. Any
+    # page within what was already kept (or with nothing left beyond it) is
+    # sliced from the cached result; only a deeper page triggers a rescan.
+    keep = offset + max_candidates
+    fingerprint = memory_fingerprint(all_memories)
+    cached = consolidation_cache.get(user_id, fingerprint)
+    if cached is None or (cached[2] < keep and cached[1] > len(cached[0])):
+        top_candidates, total_found = await asyncio.to_thread(
+            _compute_candidates, all_memories, keep
+        )
+        consolidation_cache.put(user_id, fingerprint, (top_candidates, total_found, keep))
+    else:
+        top_candidates, total_found, _ = cached
+    top_candidates = top_candidates[:keep]
+    consolidation_candidates = top_candidates[offset:]
+    next_offset = keep if total_found > keep else None
 
-    if not consolidation_candidates:
+    if not total_found:
         return [
             TextContent(
                 type="text",
-                text=json.dumps({
+                text=_dump({
                     "ok": True,
                     "message": "No similar memories found to consolidate",
                     "total_memories": len(all_memories),
-                }, indent=2)
+                })
             )
         ]
 
+    response = {
+        "ok": True,
+        "dry_run": dry_run,
+        "clusters": cluster_candidates(consolidation_candidates),
+        "count": len(consolidation_candidates),
+        "total": total_found,
+        "next_offset": next_offset,
+        "truncated": next_offset is not None,
+        "message": (
+            "Review these clusters of similar memories. Use update-memory to keep one "
+            "memory per cluster and delete-memory to remove the rest."
+        ),
+    }
+    if verbose:
+        response["candidates"] = consolidation_candidates
+
     return [
         TextContent(
             type="text",
-            text=json.dumps({
-                "ok": True,
-                "dry_run": dry_run,
-                "candidates": consolidation_candidates,
-                "count": len(consolidation_candidates),
-                "message": "Review these candidates. Use update-memory and delete-memory to consolidate manually.",
-            }, indent=2)
+            text=await _dump_large(response, len(consolidation_candidates))
         )
     ]
 
 
+# Tool name -> handler, used by call_tool for dispatch
+HANDLERS = {
+    "add-memory": handle_add_memory,
+    "get-context": handle_get_context,
+    "search-memories": handle_search_memories,
+    "get-all-memories": handle_get_all_memories,
+    "update-memory": handle_update_memory,
+    "delete-memory": handle_delete_memory,
+    "consolidate-memories": handle_consolidate_memories,
+}
+
+
 # ─────────────────────────
 # START SERVER
 # ─────────────────────────
 
 async def main():
     """Run the MCP server."""
+    # stdout carries the MCP protocol, so all logging goes to stderr
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    load_consolidation_cache()
+    atexit.register(save_consolidation_cache)
     async with stdio_server() as (read_stream, write_stream):
         await app.run(
             read_stream,
@@ -989,4 +1598,9 @@ async def main():
 
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:  # Optional speedup, default asyncio loop otherwise
+        pass
     asyncio.run(main())
@@ -0,0 +1,7 @@
+import os
+from unittest import mock
+
+# server.py builds a MemoryClient at import time, and the real one
+# validates the API key over the network
+os.environ.setdefault("MEM0_API_KEY", "test-key")
+mock.patch("mem0.MemoryClient").start()
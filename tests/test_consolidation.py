@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+import server
+
+
+def brute_force_candidates(memories: list, threshold: float) -> list[tuple]:
+    """Every pair above the threshold, most similar first, by calculate_similarity."""
+    pairs = []
+    for i in range(len(memories)):
+        for j in range(i + 1, len(memories)):
+            similarity = server.calculate_similarity(
+                memories[i]["memory"], memories[j]["memory"]
+            )
+            if similarity > threshold:
+                pairs.append((i, j, similarity))
+    pairs.sort(key=lambda pair: (-pair[2], pair[0], pair[1]))
+    return [
+        (memories[i]["id"], memories[j]["id"], round(similarity, 2))
+        for i, j, similarity in pairs
+    ]
+
+
+def random_memories(seed: int, count: int = 400) -> list[dict]:
+    """Random word sets with near-duplicates, plus a few empty memories."""
+    rng = random.Random(seed)
+    vocab = [f"w{n}" for n in range(rng.choice([15, 40, 200]))]
+    texts = []
+    while len(texts) < count:
+        base = rng.sample(vocab, rng.randint(1, 12))
+        texts.append(base)
+        for _ in range(rng.randint(0, 3)):
+            variant = list(base)
+            if rng.random() < 0.5:
+                variant[rng.randrange(len(variant))] = rng.choice(vocab)
+            if rng.random() < 0.3:
+                variant.append(rng.choice(vocab))
+            texts.append(variant)
+    texts = texts[:count] + [[], [], ["..."]]
+    rng.shuffle(texts)
+    return [{"id": str(n), "memory": " ".join(words)} for n, words in enumerate(texts)]
+
+
+def as_tuples(candidates: list) -> list[tuple]:
+    return [(c.memory1_id, c.memory2_id, c.similarity) for c in candidates]
+
+
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.7, 0.85])
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_brute_force(monkeypatch, seed, threshold):
+    monkeypatch.setattr(server, "CONSOLIDATION_THRESHOLD", threshold)
+    memories = random_memories(seed)
+    expected = brute_force_candidates(memories, threshold)
+
+    candidates, total = server._compute_candidates(memories, len(expected) + 1)
+
+    assert as_tuples(candidates) == expected
+    assert total == len(expected)
+
+
+@pytest.mark.parametrize("limit", [1, 7, 50])
+def test_limit_keeps_most_similar(monkeypatch, limit):
+    monkeypatch.setattr(server, "CONSOLIDATION_THRESHOLD", 0.5)
+    memories = random_memories(seed=9)
+    expected = brute_force_candidates(memories, 0.5)
+    assert len(expected) > limit
+
+    candidates, total = server._compute_candidates(memories, limit)
+
+    assert as_tuples(candidates) == expected[:limit]
+    assert total == len(expected)
+
+
+def test_empty_memories_never_match():
+    memories = [
+        {"id": "1", "memory": ""},
+        {"id": "2", "memory": ""},
+        {"id": "3"},
+        {"id": "4", "memory": "!!!"},
+    ]
+    assert server._compute_candidates(memories, 10) == ([], 0)